@@ -2,7 +2,9 @@
 Модуль для действий с найденными дубликатами
 """
 
+import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Tuple
 from duplicate_manager.indexer import FileIndex
@@ -11,6 +13,9 @@ from duplicate_manager.indexer import FileIndex
 class FileActions:
     """Класс для выполнения действий с файлами"""
     
+    # Потоки для групповых операций: unlink/rename отпускают GIL
+    ACTION_WORKERS = 8
+    
     def __init__(self, index: FileIndex):
         """
         Инициализация
@@ -60,7 +65,12 @@ class FileActions:
                 # Создаем директорию назначения если нужно
                 destination.parent.mkdir(parents=True, exist_ok=True)
                 
-                shutil.move(str(source), str(destination))
+                try:
+                    # В пределах одной файловой системы — атомарное переименование
+                    # поверх существующего файла, в том числе на Windows
+                    os.replace(source, destination)
+                except OSError:
+                    shutil.move(str(source), str(destination))
                 
                 if update_index:
                     self.index.update_paths(source, destination)
@@ -105,20 +115,42 @@ class FileActions:
         Returns:
             True если успешно
         """
+        temp_path = destination.with_name(f".{destination.name}.{os.getpid()}.link")
         try:
             if source.exists():
                 destination.parent.mkdir(parents=True, exist_ok=True)
                 
-                if destination.exists():
-                    destination.unlink()
-                
-                destination.hardlink_to(source)
+                # Ссылка создается под временным именем и атомарно подменяет
+                # destination: при ошибке существующий файл остается нетронутым
+                os.link(source, temp_path)
+                os.replace(temp_path, destination)
                 return True
         except (OSError, IOError) as e:
             print(f"Ошибка создания жесткой ссылки {source} -> {destination}: {e}")
+            try:
+                temp_path.unlink()
+            except OSError:
+                pass
             return False
         return False
     
+    @staticmethod
+    def _is_same_inode(file_path: Path, stat_result: os.stat_result) -> bool:
+        """
+        Проверить, указывает ли путь на тот же inode
+        
+        Args:
+            file_path: путь к файлу
+            stat_result: результат stat() файла для сравнения
+            
+        Returns:
+            True если это жесткая ссылка на тот же файл
+        """
+        try:
+            return os.path.samestat(file_path.stat(), stat_result)
+        except OSError:
+            return False
+    
     def delete_duplicates_keep_one(self, duplicate_group: List[str], keep_index: int = 0) -> int:
         """
         Удалить дубликаты, оставив один файл
@@ -134,17 +166,118 @@ class FileActions:
             keep_index = 0
         
         kept_file = Path(duplicate_group[keep_index])
-        deleted_count = 0
+        try:
+            kept_stat = kept_file.stat()
+        except OSError as e:
+            # Оставляемого файла нет: удаление остальных уничтожило бы последние копии
+            print(f"Ошибка доступа к файлу {kept_file}: {e}")
+            return 0
+        to_delete = []
+        
+        for i, file_path_str in enumerate(duplicate_group):
+            if i == keep_index:
+                continue
+            
+            file_path = Path(file_path_str)
+            # Жесткая ссылка на оставляемый файл не занимает лишнего места
+            if self._is_same_inode(file_path, kept_stat):
+                continue
+            
+            to_delete.append(file_path)
+        
+        with ThreadPoolExecutor(max_workers=self.ACTION_WORKERS) as executor:
+            results = executor.map(lambda file_path: self.delete_file(file_path, update_index=False), to_delete)
+            deleted = [file_path for file_path, ok in zip(to_delete, results) if ok]
+        
+        # Индекс обновляется и сохраняется один раз на всю группу
+        if deleted:
+            self.index.bulk_update(deletions=deleted)
+            self.index.save()
+        
+        return len(deleted)
+    
+    def replace_duplicates_with_hardlinks(self, duplicate_group: List[str], keep_index: int = 0) -> int:
+        """
+        Заменить дубликаты жесткими ссылками на оставляемый файл
+        
+        Данные не копируются и места на диске не занимают; пути дубликатов
+        сохраняются, поэтому индекс не меняется. Метаданные (время изменения,
+        права) у всех путей становятся общими с оставляемым файлом.
+        
+        Args:
+            duplicate_group: список путей к дубликатам
+            keep_index: индекс файла, на который будут указывать ссылки
+            
+        Returns:
+            количество замененных файлов
+        """
+        if keep_index >= len(duplicate_group):
+            keep_index = 0
+        
+        kept_file = Path(duplicate_group[keep_index])
+        try:
+            kept_stat = kept_file.stat()
+        except OSError as e:
+            print(f"Ошибка доступа к файлу {kept_file}: {e}")
+            return 0
+        
+        replaced_count = 0
         
         for i, file_path_str in enumerate(duplicate_group):
             if i == keep_index:
                 continue
             
             file_path = Path(file_path_str)
-            if self.delete_file(file_path):
-                deleted_count += 1
+            # Индекс мог устареть: удаленный с тех пор путь не воссоздается,
+            # а файл другого размера заведомо отличается и не затирается
+            try:
+                file_stat = file_path.stat()
+            except OSError as e:
+                print(f"Пропущен файл {file_path}: {e}")
+                continue
+            
+            if file_stat.st_size != kept_stat.st_size:
+                print(f"Пропущен файл {file_path}: размер не совпадает с {kept_file}")
+                continue
+            
+            # Уже жесткая ссылка на тот же inode
+            if os.path.samestat(file_stat, kept_stat):
+                continue
+            
+            if self.create_hard_link(kept_file, file_path):
+                replaced_count += 1
+        
+        return replaced_count
+    
+    @staticmethod
+    def _reserve_unique_name(folder: Path, stem: str, suffix: str) -> Path:
+        """
+        Занять свободное имя файла в папке
+        
+        Имя занимается созданием пустого файла с O_CREAT | O_EXCL: проверка
+        и создание выполняются одним атомарным системным вызовом, так что
+        имя не достанется другому потоку или процессу. При занятом имени
+        добавляется суффикс _1, _2, ...
         
-        return deleted_count
+        Args:
+            folder: папка назначения
+            stem: имя файла без расширения
+            suffix: расширение
+            
+        Returns:
+            путь к зарезервированному (пустому) файлу
+        """
+        counter = 0
+        while True:
+            name = f"{stem}{suffix}" if counter == 0 else f"{stem}_{counter}{suffix}"
+            candidate = folder / name
+            try:
+                fd = os.open(candidate, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                counter += 1
+                continue
+            os.close(fd)
+            return candidate
     
     def move_duplicates_to_folder(self, duplicate_group: List[str], target_folder: Path, keep_index: int = 0) -> int:
         """
@@ -161,25 +294,49 @@ class FileActions:
         if keep_index >= len(duplicate_group):
             keep_index = 0
         
-        moved_count = 0
+        try:
+            target_folder.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            print(f"Ошибка создания папки {target_folder}: {e}")
+            return 0
+        
+        # Имена назначения резервируются заранее, чтобы параллельные перемещения
+        # не заняли одно и то же имя
+        planned = []
         
         for i, file_path_str in enumerate(duplicate_group):
             if i == keep_index:
                 continue
             
             file_path = Path(file_path_str)
-            destination = target_folder / file_path.name
-            
-            # Если файл с таким именем уже существует, добавляем суффикс
-            counter = 1
-            while destination.exists():
-                stem = file_path.stem
-                suffix = file_path.suffix
-                destination = target_folder / f"{stem}_{counter}{suffix}"
-                counter += 1
+            try:
+                destination = self._reserve_unique_name(target_folder, file_path.stem, file_path.suffix)
+            except OSError as e:
+                print(f"Ошибка перемещения файла {file_path} -> {target_folder}: {e}")
+                continue
             
-            if self.move_file(file_path, destination):
-                moved_count += 1
+            planned.append((file_path, destination))
+        
+        with ThreadPoolExecutor(max_workers=self.ACTION_WORKERS) as executor:
+            results = list(executor.map(
+                lambda pair: self.move_file(pair[0], pair[1], update_index=False), planned
+            ))
+        
+        moved = []
+        for (file_path, destination), ok in zip(planned, results):
+            if ok:
+                moved.append((file_path, destination))
+            else:
+                # Освобождаем зарезервированное имя
+                try:
+                    destination.unlink()
+                except OSError:
+                    pass
+        
+        # Индекс обновляется и сохраняется один раз на всю группу
+        if moved:
+            self.index.bulk_update(renames=moved)
+            self.index.save()
         
-        return moved_count
+        return len(moved)
 
@@ -140,6 +140,7 @@ def interactive(ctx):
             click.echo("  1. Удалить все кроме первого")
             click.echo("  2. Переместить дубликаты в папку")
             click.echo("  3. Пропустить")
+            click.echo("  4. Заменить дубликаты жесткими ссылками на первый")
             
             choice = click.prompt("Выберите действие", type=int, default=3)
             
@@ -155,6 +156,11 @@ def interactive(ctx):
                     target_path.mkdir(parents=True, exist_ok=True)
                     moved = actions.move_duplicates_to_folder(file_paths, target_path, keep_index=0)
                     click.echo(f"Перемещено файлов: {moved}")
+            
+            elif choice == 4:
+                if click.confirm("Заменить дубликаты жесткими ссылками на первый файл?"):
+                    replaced = actions.replace_duplicates_with_hardlinks(file_paths, keep_index=0)
+                    click.echo(f"Заменено файлов: {replaced}")
     
     if len(duplicates) > 10:
         click.echo(f"\n... и еще {len(duplicates) - 10} групп")
@@ -180,6 +186,18 @@ def stats(ctx):
         click.echo(f"Потенциальная экономия места: {wasted_mb:.2f} MB")
 
 
+@cli.command()
+@click.argument('output', type=click.Path())
+@click.pass_context
+def export_index(ctx, output):
+    """Выгрузить индекс в JSON"""
+    config = ctx.obj['config']
+    scanner = FileScanner(config)
+    
+    if scanner.index.export_json(Path(output)):
+        click.echo(f"Индекс выгружен в: {output}")
+
+
 @cli.command()
 @click.confirmation_option(prompt='Вы уверены? Это удалит весь индекс.')
 @click.pass_context
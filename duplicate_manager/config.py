@@ -4,23 +4,57 @@
 
 import json
 import os
+import re
 from pathlib import Path
 from typing import List, Optional, Dict, Any
 
 
+def write_json_atomic(file_path: Path, data: Any) -> None:
+    """
+    Записать JSON во временный файл рядом и подменить им исходный
+    
+    os.replace атомарен, поэтому сбой посреди записи оставляет прежний
+    файл целым, а не обрезанным.
+    
+    Args:
+        file_path: путь к файлу
+        data: сериализуемые данные
+        
+    Raises:
+        OSError: если файл не удалось записать
+    """
+    file_path = Path(file_path)
+    temp_path = file_path.with_name(file_path.name + ".tmp")
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(temp_path, file_path)
+    except OSError:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
 class Config:
     """Класс для управления конфигурацией"""
     
     DEFAULT_CONFIG = {
-        "hash_algorithm": "md5",  # md5 или sha256
+        "hash_algorithm": "blake3",  # blake3, md5, sha256 или xxh3 (требуется пакет xxhash)
         "min_file_size": 0,  # минимальный размер файла в байтах
         "max_file_size": None,  # максимальный размер файла в байтах (None = без ограничений)
         "exclude_patterns": [".git", "__pycache__", "node_modules", ".venv", "venv"],
         "exclude_extensions": [".tmp", ".swp", ".DS_Store"],
         "image_similarity_threshold": 0.95,  # порог схожести изображений (0-1)
+        "max_image_pixels": 200_000_000,  # изображения больше этого считаются decompression bomb
         "text_containment_threshold": 0.8,  # порог содержания текста (0-1)
         "index_path": ".duplicate_index",  # путь к файлу индекса
-        "chunk_size": 8192,  # размер чанка для чтения файлов
+        "chunk_size": 1024 * 1024,  # размер чанка для чтения файлов
+        "mmap_threshold": 1024 * 1024,  # файлы от этого размера хешируются и читаются через mmap
+        "hash_workers": None,  # количество потоков хеширования (None = 2 × число ядер, для процессов — число ядер)
+        "hash_executor": "thread",  # thread или process (пул процессов для множества мелких файлов)
+        "io_uring": False,  # пакетное чтение через io_uring (Linux, требуется пакет liburing)
         "supported_image_formats": [".jpg", ".jpeg", ".png", ".bmp", ".gif", ".webp", ".tiff"],
         "supported_text_extensions": [".txt", ".py", ".js", ".html", ".css", ".md", ".json", ".xml", ".csv"],
         "removable_drives": [],  # список путей к съемным носителям
@@ -44,6 +78,12 @@ class Config:
             self.load()
         else:
             self.save()
+        
+        self._rebuild_caches()
+    
+    def _suffix_set(self, key: str) -> frozenset:
+        """Множество расширений из параметра конфигурации в нижнем регистре"""
+        return frozenset(ext.lower() for ext in self.config.get(key, []))
     
     def load(self) -> None:
         """Загрузка конфигурации из файла"""
@@ -53,12 +93,32 @@ class Config:
                 self.config.update(loaded_config)
         except (json.JSONDecodeError, IOError) as e:
             print(f"Ошибка загрузки конфигурации: {e}. Используются значения по умолчанию.")
+        
+        self._rebuild_caches()
+    
+    def _rebuild_caches(self) -> None:
+        """
+        Подготовить структуры для быстрых проверок файлов
+        
+        Проверки вызываются для каждого файла при сканировании, поэтому
+        списки расширений заменяются множествами, а паттерны исключений
+        объединяются в одно регулярное выражение. Расширения приводятся
+        к нижнему регистру, как и суффиксы проверяемых файлов.
+        """
+        self._exclude_ext = self._suffix_set("exclude_extensions")
+        self._image_ext = self._suffix_set("supported_image_formats")
+        self._text_ext = self._suffix_set("supported_text_extensions")
+        
+        patterns = self.config.get("exclude_patterns", [])
+        if patterns:
+            self._exclude_re = re.compile("|".join(map(re.escape, patterns)))
+        else:
+            self._exclude_re = None
     
     def save(self) -> None:
         """Сохранение конфигурации в файл"""
         try:
-            with open(self.config_path, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, indent=2, ensure_ascii=False)
+            write_json_atomic(self.config_path, self.config)
         except IOError as e:
             print(f"Ошибка сохранения конфигурации: {e}")
     
@@ -69,34 +129,60 @@ class Config:
     def set(self, key: str, value: Any) -> None:
         """Установить значение конфигурации"""
         self.config[key] = value
+        self._rebuild_caches()
     
-    def should_exclude(self, file_path: Path) -> bool:
+    def should_exclude(self, file_path: Path, root: Optional[str] = None) -> bool:
         """
         Проверить, нужно ли исключить файл из поиска
         
         Args:
             file_path: путь к файлу
+            root: корень сканирования; паттерны проверяются по пути относительно
+                него, чтобы на результат не влияли имена родительских каталогов
             
         Returns:
             True если файл нужно исключить
         """
         # Проверка расширения
-        if file_path.suffix.lower() in self.config.get("exclude_extensions", []):
+        if file_path.suffix.lower() in self._exclude_ext:
             return True
         
-        # Проверка паттернов
-        path_str = str(file_path)
-        for pattern in self.config.get("exclude_patterns", []):
-            if pattern in path_str:
-                return True
+        # Проверка паттернов (все подстроки проверяются одним регулярным выражением)
+        return self._matches_pattern(str(file_path), root)
+    
+    def should_exclude_dir(self, dir_path: Path, root: Optional[str] = None) -> bool:
+        """
+        Проверить, нужно ли пропустить каталог целиком
+        
+        Если путь каталога содержит паттерн исключения, его содержат и пути
+        всех вложенных файлов, поэтому в такой каталог можно не заходить.
+        
+        Args:
+            dir_path: путь к каталогу
+            root: корень сканирования (см. should_exclude)
+            
+        Returns:
+            True если каталог нужно пропустить
+        """
+        return self._matches_pattern(str(dir_path), root)
+    
+    def _matches_pattern(self, path_str: str, root: Optional[str]) -> bool:
+        """Проверить путь (относительно root, если он задан) по паттернам исключений"""
+        if self._exclude_re is None:
+            return False
+        
+        if root is not None:
+            prefix = os.path.join(root, "")
+            if path_str.startswith(prefix):
+                path_str = path_str[len(prefix):]
         
-        return False
+        return self._exclude_re.search(path_str) is not None
     
     def is_supported_image(self, file_path: Path) -> bool:
         """Проверить, является ли файл поддерживаемым изображением"""
-        return file_path.suffix.lower() in self.config.get("supported_image_formats", [])
+        return file_path.suffix.lower() in self._image_ext
     
     def is_supported_text(self, file_path: Path) -> bool:
         """Проверить, является ли файл поддерживаемым текстовым файлом"""
-        return file_path.suffix.lower() in self.config.get("supported_text_extensions", [])
+        return file_path.suffix.lower() in self._text_ext
 
@@ -2,15 +2,38 @@
 Модуль для вычисления хешей файлов (УР1: поиск одинаковых файлов)
 """
 
+import functools
 import hashlib
+import mmap
+import os
+import stat
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from duplicate_manager.config import Config
 
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
 
 class FileHasher:
     """Класс для вычисления хешей файлов"""
     
+    # Размер блока в начале и в конце файла для быстрого отпечатка
+    FINGERPRINT_BLOCK = 4096
+    # Начиная с этого размера BLAKE3 хеширует один файл в несколько потоков
+    BLAKE3_THREADS_THRESHOLD = 16 * 1024 * 1024
+    # Файлы больше окна отображаются в память по частям (кратно гранулярности mmap)
+    MMAP_WINDOW = 1024 * 1024 * 1024
+    
     def __init__(self, config: Config):
         """
         Инициализация
@@ -20,7 +43,106 @@ class FileHasher:
         """
         self.config = config
         self.algorithm = config.get("hash_algorithm", "md5")
-        self.chunk_size = config.get("chunk_size", 8192)
+        # Конструктор хеша выбирается один раз, а не при каждом файле
+        self._hasher_factory, self._large_hasher_factory = self._resolve_factories(self.algorithm)
+        self.chunk_size = config.get("chunk_size", 1024 * 1024)
+        self.mmap_threshold = config.get("mmap_threshold", 1024 * 1024)
+        # Хеширование упирается в I/O, а hashlib отпускает GIL,
+        # поэтому потоков берем больше, чем ядер
+        self.workers = config.get("hash_workers") or (os.cpu_count() or 1) * 2
+        self.executor = config.get("hash_executor", "thread")
+        if self.executor not in ("thread", "process"):
+            raise ValueError(f"Неподдерживаемый тип пула хеширования: {self.executor}")
+        # Хеши по (устройство, inode, размер, mtime_ns): жесткие ссылки на одни данные
+        # читаются один раз, а измененный на месте файл или занятый заново inode
+        # дают новый ключ
+        self.inode_cache: Dict[Tuple[int, int, int, int], str] = {}
+        # Буфер чтения на поток переиспользуется между файлами
+        self._local = threading.local()
+    
+    @staticmethod
+    def _resolve_factories(algorithm: str) -> Tuple[Callable, Callable]:
+        """
+        Выбрать конструкторы объектов хеширования для алгоритма
+        
+        Args:
+            algorithm: название алгоритма
+            
+        Returns:
+            кортеж (конструктор для обычных файлов, конструктор для больших файлов)
+        """
+        if algorithm == "md5":
+            return hashlib.md5, hashlib.md5
+        elif algorithm == "sha256":
+            return hashlib.sha256, hashlib.sha256
+        elif algorithm == "blake3":
+            if blake3 is None:
+                raise ValueError("Для алгоритма blake3 установите пакет blake3")
+            return blake3.blake3, functools.partial(blake3.blake3, max_threads=blake3.blake3.AUTO)
+        elif algorithm == "xxh3":
+            if xxhash is None:
+                raise ValueError("Для алгоритма xxh3 установите пакет xxhash")
+            return xxhash.xxh3_128, xxhash.xxh3_128
+        else:
+            raise ValueError(f"Неподдерживаемый алгоритм: {algorithm}")
+    
+    def _new_hasher(self, size: int = 0):
+        """
+        Создать объект хеширования для настроенного алгоритма
+        
+        Args:
+            size: размер хешируемого файла
+            
+        Returns:
+            объект с методами update() и hexdigest()
+        """
+        if size >= self.BLAKE3_THREADS_THRESHOLD:
+            return self._large_hasher_factory()
+        return self._hasher_factory()
+    
+    def _read_buffer(self) -> memoryview:
+        """Буфер для чтения чанков, свой у каждого потока"""
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = memoryview(bytearray(self.chunk_size))
+            self._local.buffer = buffer
+        return buffer
+    
+    def _update_mmap(self, hasher, f, size: int) -> None:
+        """
+        Передать файл хешу через mmap: без цикла на Python и без копирования в bytes
+        
+        Args:
+            hasher: объект хеширования
+            f: открытый файл
+            size: размер файла
+        """
+        for offset in range(0, size, self.MMAP_WINDOW):
+            length = min(self.MMAP_WINDOW, size - offset)
+            with mmap.mmap(f.fileno(), length, access=mmap.ACCESS_READ, offset=offset) as mm:
+                if hasattr(mmap, "MADV_SEQUENTIAL"):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                hasher.update(mm)
+    
+    def _update_chunked(self, hasher, f) -> None:
+        """
+        Передать файл хешу чанками через переиспользуемый буфер
+        
+        Args:
+            hasher: объект хеширования
+            f: открытый файл
+        """
+        buffer = self._read_buffer()
+        while size := f.readinto(buffer):
+            hasher.update(buffer[:size])
+    
+    @staticmethod
+    def _inode_key(stat_result: os.stat_result) -> Optional[Tuple[int, int, int, int]]:
+        """Ключ кеша по inode (None, если файловая система не сообщает inode)"""
+        if not stat_result.st_ino:
+            return None
+        return (stat_result.st_dev, stat_result.st_ino,
+                stat_result.st_size, stat_result.st_mtime_ns)
     
     def calculate_hash(self, file_path: Path) -> Optional[str]:
         """
@@ -33,22 +155,161 @@ class FileHasher:
             хеш файла в hex формате или None в случае ошибки
         """
         try:
-            if self.algorithm == "md5":
-                hasher = hashlib.md5()
-            elif self.algorithm == "sha256":
-                hasher = hashlib.sha256()
-            else:
-                raise ValueError(f"Неподдерживаемый алгоритм: {self.algorithm}")
+            stat_result = file_path.stat()
+            inode_key = self._inode_key(stat_result)
+            if inode_key in self.inode_cache:
+                return self.inode_cache[inode_key]
             
-            with open(file_path, 'rb') as f:
-                while chunk := f.read(self.chunk_size):
-                    hasher.update(chunk)
+            hasher = self._new_hasher(stat_result.st_size)
+            if stat_result.st_size == 0:
+                # Хеш пустого файла известен без открытия
+                return hasher.hexdigest()
+            
+            # Без буферизации: чанки читаются сразу в переиспользуемый буфер
+            with open(file_path, 'rb', buffering=0) as f:
+                if stat_result.st_size >= self.mmap_threshold:
+                    try:
+                        self._update_mmap(hasher, f, stat_result.st_size)
+                    except (OSError, ValueError):
+                        # Файловая система не поддерживает mmap или файл укоротили:
+                        # начинаем заново обычным чтением
+                        hasher = self._new_hasher(stat_result.st_size)
+                        f.seek(0)
+                        self._update_chunked(hasher, f)
+                else:
+                    self._update_chunked(hasher, f)
             
-            return hasher.hexdigest()
+            file_hash = hasher.hexdigest()
+            if inode_key is not None:
+                self.inode_cache[inode_key] = file_hash
+            return file_hash
         except (IOError, OSError) as e:
             print(f"Ошибка при вычислении хеша для {file_path}: {e}")
             return None
     
+    def quick_fingerprint(self, file_path: Path) -> Optional[Tuple[int, str, str]]:
+        """
+        Вычислить быстрый отпечаток файла по размеру, началу и концу
+        
+        Файлы с разными отпечатками заведомо различны, поэтому полный хеш
+        нужен только при совпадении отпечатков.
+        
+        Args:
+            file_path: путь к файлу
+            
+        Returns:
+            кортеж (размер, md5 первых 4 КБ, md5 последних 4 КБ) или None в случае ошибки
+        """
+        result = self.calculate_hash_progressive(file_path)
+        return result[0] if result is not None else None
+    
+    def calculate_hash_progressive(self, file_path: Path) -> Optional[Tuple[Tuple[int, str, str], Optional[str]]]:
+        """
+        Вычислить быстрый отпечаток файла и, если это ничего не стоит, полный хеш
+        
+        Для файлов не больше двух блоков отпечаток читает файл целиком,
+        поэтому полный хеш считается по тем же данным без повторного чтения.
+        
+        Args:
+            file_path: путь к файлу
+            
+        Returns:
+            кортеж (отпечаток, полный хеш или None) или None в случае ошибки
+        """
+        block = self.FINGERPRINT_BLOCK
+        try:
+            with open(file_path, 'rb') as f:
+                stat_result = os.fstat(f.fileno())
+                size = stat_result.st_size
+                head = f.read(block)
+                tail = b""
+                if size > block:
+                    f.seek(-min(block, size - block), os.SEEK_END)
+                    tail = f.read(block)
+        except (IOError, OSError) as e:
+            print(f"Ошибка при чтении {file_path}: {e}")
+            return None
+        
+        fingerprint = (size, hashlib.md5(head).hexdigest(), hashlib.md5(tail).hexdigest())
+        if len(head) + len(tail) != size:
+            return fingerprint, None
+        
+        hasher = self._new_hasher(size)
+        hasher.update(head)
+        hasher.update(tail)
+        file_hash = hasher.hexdigest()
+        inode_key = self._inode_key(stat_result)
+        if inode_key is not None:
+            self.inode_cache[inode_key] = file_hash
+        return fingerprint, file_hash
+    
+    def iter_fingerprints(self, paths: Iterable[Path]) -> Iterator[Tuple[Path, Optional[Tuple[Tuple[int, str, str], Optional[str]]]]]:
+        """
+        Вычислить быстрые отпечатки нескольких файлов параллельно
+        
+        Args:
+            paths: пути к файлам
+            
+        Yields:
+            кортежи (путь, результат calculate_hash_progressive) в порядке входных путей
+        """
+        paths = list(paths)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            yield from zip(paths, executor.map(self.calculate_hash_progressive, paths))
+    
+    def iter_hashes(self, paths: Iterable[Path]) -> Iterator[Tuple[Path, Optional[str]]]:
+        """
+        Вычислить хеши нескольких файлов параллельно в пуле потоков
+        
+        Args:
+            paths: пути к файлам
+            
+        Yields:
+            кортежи (путь, хеш или None) в порядке входных путей
+        """
+        paths = list(paths)
+        if self.executor == "process" and len(paths) > 1:
+            yield from self._iter_hashes_processes(paths)
+            return
+        
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            yield from zip(paths, executor.map(self.calculate_hash, paths))
+    
+    def _iter_hashes_processes(self, paths: List[Path]) -> Iterator[Tuple[Path, Optional[str]]]:
+        """
+        Вычислить хеши в пуле процессов
+        
+        На множестве мелких файлов потоки упираются в GIL (открытие файла и
+        обвязка вокруг hashlib выполняются на Python), процессы его обходят.
+        Кеш inode у каждого процесса свой.
+        
+        Args:
+            paths: пути к файлам
+            
+        Yields:
+            кортежи (путь, хеш или None) в порядке входных путей
+        """
+        workers = self.config.get("hash_workers") or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_hash_worker,
+                                 initargs=(self.config,)) as executor:
+            yield from zip(paths, executor.map(_hash_worker, paths, chunksize=32))
+    
+    def calculate_hashes(self, paths: Iterable[Path]) -> Dict[Path, str]:
+        """
+        Вычислить хеши нескольких файлов параллельно
+        
+        Args:
+            paths: пути к файлам
+            
+        Returns:
+            словарь {путь: хеш}; файлы, которые не удалось прочитать, пропускаются
+        """
+        return {
+            file_path: file_hash
+            for file_path, file_hash in self.iter_hashes(paths)
+            if file_hash is not None
+        }
+    
     def get_file_size(self, file_path: Path) -> int:
         """
         Получить размер файла
@@ -64,23 +325,45 @@ class FileHasher:
         except (OSError, IOError):
             return 0
     
-    def should_process(self, file_path: Path) -> bool:
+    def should_process(self, entry: Union[os.DirEntry, Path],
+                       stat_result: Optional[os.stat_result] = None,
+                       root: Optional[str] = None) -> bool:
         """
         Проверить, нужно ли обрабатывать файл
         
+        Все проверки делаются по одному результату stat(): для DirEntry он
+        берется из кеша записи каталога, для Path запрашивается один раз,
+        если не передан явно.
+        
         Args:
-            file_path: путь к файлу
+            entry: запись каталога из os.scandir или путь к файлу
+            stat_result: заранее полученный результат stat() (опционально)
+            root: корень сканирования для проверки паттернов исключений (опционально)
             
         Returns:
             True если файл нужно обработать
         """
-        if not file_path.is_file():
+        try:
+            if isinstance(entry, os.DirEntry):
+                # Символические ссылки не обрабатываем: это не копии данных
+                if not entry.is_file(follow_symlinks=False):
+                    return False
+                file_path = Path(entry.path)
+                if stat_result is None:
+                    stat_result = entry.stat(follow_symlinks=False)
+            else:
+                file_path = entry
+                if stat_result is None:
+                    stat_result = file_path.stat()
+                if not stat.S_ISREG(stat_result.st_mode):
+                    return False
+        except (OSError, IOError):
             return False
         
-        if self.config.should_exclude(file_path):
+        if self.config.should_exclude(file_path, root):
             return False
         
-        file_size = self.get_file_size(file_path)
+        file_size = stat_result.st_size
         min_size = self.config.get("min_file_size", 0)
         max_size = self.config.get("max_file_size")
         
@@ -92,3 +375,17 @@ class FileHasher:
         
         return True
 
+
+# FileHasher процесса-обработчика пула, создается один раз при его запуске
+_worker_hasher: Optional[FileHasher] = None
+
+
+def _init_hash_worker(config: Config) -> None:
+    """Создать FileHasher в процессе пула"""
+    global _worker_hasher
+    _worker_hasher = FileHasher(config)
+
+
+def _hash_worker(file_path: Path) -> Optional[str]:
+    """Вычислить хеш файла в процессе пула"""
+    return _worker_hasher.calculate_hash(file_path)
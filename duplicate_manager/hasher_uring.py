@@ -0,0 +1,180 @@
+"""
+Модуль для пакетного хеширования файлов через io_uring (Linux, опционально)
+"""
+
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from duplicate_manager.config import Config
+from duplicate_manager.hasher import FileHasher
+
+try:
+    import liburing
+except ImportError:
+    liburing = None
+
+
+class UringHasher(FileHasher):
+    """
+    Хеширование множества файлов пакетными чтениями через io_uring
+
+    Для каждого файла в очереди держится одно чтение очередного чанка,
+    завершения разбираются пачками. Если liburing недоступен или ядро
+    не поддерживает io_uring, используется обычный пул потоков.
+    """
+
+    QUEUE_DEPTH = 128
+
+    def __init__(self, config: Config):
+        """
+        Инициализация
+
+        Args:
+            config: объект конфигурации
+        """
+        super().__init__(config)
+        self.queue_depth = config.get("io_uring_queue_depth", self.QUEUE_DEPTH)
+
+    @staticmethod
+    def is_available() -> bool:
+        """Проверить, установлен ли пакет liburing"""
+        return liburing is not None
+
+    def iter_hashes(self, paths: Iterable[Path]) -> Iterator[Tuple[Path, Optional[str]]]:
+        """
+        Вычислить хеши нескольких файлов через io_uring
+
+        Args:
+            paths: пути к файлам
+
+        Yields:
+            кортежи (путь, хеш или None) в порядке завершения хеширования
+        """
+        paths = list(paths)
+        if liburing is None or len(paths) <= 1:
+            yield from super().iter_hashes(paths)
+            return
+
+        ring = liburing.Ring()
+        try:
+            liburing.io_uring_queue_init(self.queue_depth, ring)
+        except OSError:
+            # io_uring запрещен или не поддерживается ядром
+            yield from super().iter_hashes(paths)
+            return
+
+        try:
+            yield from self._iter_hashes_uring(ring, paths)
+        finally:
+            liburing.io_uring_queue_exit(ring)
+
+    def _iter_hashes_uring(self, ring, paths: List[Path]) -> Iterator[Tuple[Path, Optional[str]]]:
+        """
+        Основной цикл хеширования на инициализированном кольце
+
+        Args:
+            ring: кольцо io_uring
+            paths: пути к файлам
+
+        Yields:
+            кортежи (путь, хеш или None)
+        """
+        slots = min(self.queue_depth, len(paths))
+        buffers = [bytearray(self.chunk_size) for _ in range(slots)]
+        # Зарегистрированные буферы избавляют ядро от маппинга страниц на каждое чтение;
+        # при нехватке RLIMIT_MEMLOCK работаем с обычными буферами
+        try:
+            liburing.io_uring_register_buffers(ring, liburing.Iovec(buffers))
+            fixed = True
+        except OSError:
+            fixed = False
+
+        # Состояние слота: [путь, fd, объект хеширования, смещение, размер, ключ inode]
+        states: Dict[int, list] = {}
+        pending = iter(paths)
+        cqe = liburing.Cqe()
+
+        def submit_read(slot: int) -> None:
+            _, fd, _, offset, _, _ = states[slot]
+            sqe = liburing.io_uring_get_sqe(ring)
+            if fixed:
+                liburing.io_uring_prep_read_fixed(sqe, fd, buffers[slot], slot, offset)
+            else:
+                liburing.io_uring_prep_read(sqe, fd, buffers[slot], offset)
+            liburing.io_uring_sqe_set_data64(sqe, slot)
+
+        def finish(slot: int, file_hash: Optional[str]) -> Tuple[Path, Optional[str]]:
+            file_path, fd, _, _, _, inode_key = states.pop(slot)
+            os.close(fd)
+            if file_hash is not None and inode_key is not None:
+                self.inode_cache[inode_key] = file_hash
+            return file_path, file_hash
+
+        def fill(slot: int) -> Iterator[Tuple[Path, Optional[str]]]:
+            # Открываем следующий файл в свободном слоте; пустые и нечитаемые файлы
+            # завершаются сразу, без обращения к кольцу
+            for file_path in pending:
+                try:
+                    fd = os.open(file_path, os.O_RDONLY)
+                    stat_result = os.fstat(fd)
+                except OSError as e:
+                    print(f"Ошибка при вычислении хеша для {file_path}: {e}")
+                    yield file_path, None
+                    continue
+
+                inode_key = self._inode_key(stat_result)
+                if inode_key in self.inode_cache:
+                    os.close(fd)
+                    yield file_path, self.inode_cache[inode_key]
+                    continue
+
+                size = stat_result.st_size
+                states[slot] = [file_path, fd, self._new_hasher(size), 0, size, inode_key]
+                if size == 0:
+                    yield finish(slot, states[slot][2].hexdigest())
+                    continue
+
+                submit_read(slot)
+                return
+
+        try:
+            for slot in range(slots):
+                yield from fill(slot)
+
+            while states:
+                liburing.io_uring_submit_and_wait(ring, 1)
+                # Забираем все готовые завершения, прежде чем ставить новые чтения
+                completed = []
+                while True:
+                    try:
+                        liburing.io_uring_peek_cqe(ring, cqe)
+                    except BlockingIOError:
+                        break
+                    entry = cqe[0]
+                    slot = liburing.io_uring_cqe_get_data64(entry)
+                    try:
+                        completed.append((slot, entry.res, None))
+                    except OSError as e:
+                        completed.append((slot, -1, e))
+                    liburing.io_uring_cqe_seen(ring, entry)
+
+                for slot, res, error in completed:
+                    state = states[slot]
+                    if error is not None:
+                        print(f"Ошибка при вычислении хеша для {state[0]}: {error}")
+                        yield finish(slot, None)
+                        yield from fill(slot)
+                        continue
+
+                    state[2].update(memoryview(buffers[slot])[:res])
+                    state[3] += res
+                    if res == 0 or state[3] >= state[4]:
+                        yield finish(slot, state[2].hexdigest())
+                        yield from fill(slot)
+                    else:
+                        submit_read(slot)
+        finally:
+            for file_path, fd, _, _, _, _ in states.values():
+                os.close(fd)
+            if fixed:
+                liburing.io_uring_unregister_buffers(ring)
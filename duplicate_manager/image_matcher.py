@@ -4,14 +4,31 @@
 
 from pathlib import Path
 from typing import List, Tuple, Optional
-from PIL import Image
+import numpy as np
+from scipy.fft import dctn
+from PIL import Image, UnidentifiedImageError
 import imagehash
 from duplicate_manager.config import Config
+from duplicate_manager.indexer import FileIndex
+
+
+def _popcount(values: np.ndarray) -> np.ndarray:
+    """Число единичных бит в каждом элементе массива np.uint64"""
+    if hasattr(np, "bitwise_count"):
+        # NumPy >= 2.0: аппаратная инструкция POPCNT
+        return np.bitwise_count(values)
+    return np.unpackbits(values.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
 
 
 class ImageMatcher:
     """Класс для сравнения изображений"""
     
+    # Параметры pHash, совпадающие с imagehash.phash
+    HASH_SIZE = 8
+    HIGHFREQ_FACTOR = 4
+    # Сколько миниатюр обрабатывается одним вызовом DCT
+    BATCH_SIZE = 1024
+    
     def __init__(self, config: Config):
         """
         Инициализация
@@ -21,6 +38,9 @@ class ImageMatcher:
         """
         self.config = config
         self.threshold = config.get("image_similarity_threshold", 0.95)
+        # Ограничение на размер декодируемого изображения защищает от распаковки
+        # гигантских PNG в память
+        Image.MAX_IMAGE_PIXELS = config.get("max_image_pixels", 200_000_000)
     
     def load_image(self, file_path: Path) -> Optional[Image.Image]:
         """
@@ -33,8 +53,15 @@ class ImageMatcher:
             объект PIL Image или None в случае ошибки
         """
         try:
-            return Image.open(file_path)
-        except (IOError, OSError, Exception) as e:
+            image = Image.open(file_path)
+            # pHash нужна только миниатюра 32×32: JPEG декодируется сразу в оттенках
+            # серого и в уменьшенном масштабе (не меньше двойного размера миниатюры)
+            draft_size = self.HASH_SIZE * self.HIGHFREQ_FACTOR * 2
+            image.draft("L", (draft_size, draft_size))
+            # Ошибки декодирования проявляются здесь, а не при вычислении хеша
+            image.load()
+            return image
+        except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
             print(f"Ошибка загрузки изображения {file_path}: {e}")
             return None
     
@@ -51,7 +78,7 @@ class ImageMatcher:
         try:
             # Используем perceptual hash (pHash) для сравнения по содержимому
             return imagehash.phash(image)
-        except Exception as e:
+        except (OSError, ValueError) as e:
             print(f"Ошибка вычисления хеша изображения: {e}")
             return None
     
@@ -70,8 +97,19 @@ class ImageMatcher:
             return 0.0
         
         # Вычисляем расстояние между хешами
-        distance = hash1 - hash2
+        return self.similarity_from_distance(hash1 - hash2)
+    
+    @staticmethod
+    def similarity_from_distance(distance: int) -> float:
+        """
+        Преобразовать расстояние Хэмминга между pHash в коэффициент схожести
         
+        Args:
+            distance: число различающихся бит
+            
+        Returns:
+            коэффициент схожести (0-1), где 1 = идентичные
+        """
         # Максимальное расстояние для pHash обычно 64
         max_distance = 64.0
         
@@ -80,6 +118,125 @@ class ImageMatcher:
         
         return max(0.0, min(1.0, similarity))
     
+    def max_distance(self) -> int:
+        """Максимальное расстояние Хэмминга, при котором схожесть не ниже порога"""
+        return max(0, int((1.0 - self.threshold) * 64 + 1e-9))
+    
+    def _load_thumbnail(self, file_path: Path) -> Optional[np.ndarray]:
+        """
+        Загрузить изображение как полутоновую миниатюру для pHash
+        
+        Args:
+            file_path: путь к файлу изображения
+            
+        Returns:
+            массив пикселей размера 32×32 или None в случае ошибки
+        """
+        image = self.load_image(file_path)
+        if image is None:
+            return None
+        
+        img_size = self.HASH_SIZE * self.HIGHFREQ_FACTOR
+        try:
+            thumbnail = image.convert("L").resize((img_size, img_size), Image.LANCZOS)
+            return np.asarray(thumbnail, dtype=np.float64)
+        except (OSError, ValueError) as e:
+            print(f"Ошибка загрузки изображения {file_path}: {e}")
+            return None
+        finally:
+            image.close()
+    
+    def batch_phash(self, image_files: List[Path]) -> Tuple[List[Path], np.ndarray]:
+        """
+        Вычислить pHash для набора изображений пакетно
+        
+        Миниатюры складываются в один массив, и DCT считается одним вызовом
+        на весь пакет. Результат побитово совпадает с imagehash.phash.
+        
+        Args:
+            image_files: список путей к изображениям
+            
+        Returns:
+            кортеж (пути успешно обработанных изображений, массив хешей np.uint64)
+        """
+        paths = []
+        batches = []
+        thumbnails = []
+        
+        for file_path in image_files:
+            thumbnail = self._load_thumbnail(file_path)
+            if thumbnail is None:
+                continue
+            
+            paths.append(file_path)
+            thumbnails.append(thumbnail)
+            if len(thumbnails) == self.BATCH_SIZE:
+                batches.append(self._phash_stack(np.stack(thumbnails)))
+                thumbnails = []
+        
+        if thumbnails:
+            batches.append(self._phash_stack(np.stack(thumbnails)))
+        
+        if not batches:
+            return [], np.empty(0, dtype=np.uint64)
+        
+        return paths, np.concatenate(batches)
+    
+    def cached_phash(self, image_files: List[Path], index: FileIndex) -> Tuple[List[Path], np.ndarray]:
+        """
+        Получить pHash изображений, вычисляя только отсутствующие в кеше индекса
+        
+        Ключ кеша включает inode, время изменения и размер файла, поэтому
+        измененные файлы хешируются заново.
+        
+        Args:
+            image_files: список путей к изображениям
+            index: индекс, в котором хранится кеш pHash
+            
+        Returns:
+            кортеж (пути успешно обработанных изображений, массив хешей np.uint64)
+        """
+        known = {}
+        missing_keys = {}
+        
+        for file_path in image_files:
+            try:
+                key = index.image_cache_key(file_path.stat())
+            except OSError as e:
+                print(f"Ошибка загрузки изображения {file_path}: {e}")
+                continue
+            
+            value = index.get_image_hash(key)
+            if value is not None:
+                known[file_path] = value
+            else:
+                missing_keys[file_path] = key
+        
+        computed_paths, computed_hashes = self.batch_phash(list(missing_keys))
+        for file_path, value in zip(computed_paths, computed_hashes):
+            index.set_image_hash(missing_keys[file_path], int(value))
+            known[file_path] = int(value)
+        
+        paths = [file_path for file_path in image_files if file_path in known]
+        return paths, np.array([known[file_path] for file_path in paths], dtype=np.uint64)
+    
+    def _phash_stack(self, pixels: np.ndarray) -> np.ndarray:
+        """
+        Вычислить pHash для стопки миниатюр
+        
+        Args:
+            pixels: массив миниатюр формы (N, 32, 32)
+            
+        Returns:
+            массив хешей np.uint64 длины N
+        """
+        dct = dctn(pixels, axes=(-2, -1), workers=-1)
+        low_freq = dct[:, :self.HASH_SIZE, :self.HASH_SIZE].reshape(len(pixels), -1)
+        medians = np.median(low_freq, axis=1, keepdims=True)
+        bits = np.packbits(low_freq > medians, axis=1)
+        # Первый бит — старший, как в строковом представлении ImageHash
+        return bits.view(">u8").ravel().astype(np.uint64)
+    
     def compare_images(self, image1: Image.Image, image2: Image.Image) -> float:
         """
         Сравнить два изображения
@@ -99,96 +256,85 @@ class ImageMatcher:
         
         return self.calculate_similarity(hash1, hash2)
     
-    def find_similar_images(self, image_path: Path, other_images: List[Path]) -> List[Tuple[Path, float]]:
+    def _phash_all(self, image_files: List[Path],
+                   index: Optional[FileIndex] = None) -> Tuple[List[Path], np.ndarray]:
+        """
+        Вычислить pHash всех изображений один раз, через кеш индекса, если он передан
+        
+        Args:
+            image_files: список путей к изображениям
+            index: индекс для кеширования pHash между запусками (опционально)
+            
+        Returns:
+            кортеж (пути успешно обработанных изображений, массив хешей np.uint64)
+        """
+        if index is not None:
+            return self.cached_phash(image_files, index)
+        return self.batch_phash(image_files)
+    
+    def find_similar_images(self, image_path: Path, other_images: List[Path],
+                            index: Optional[FileIndex] = None) -> List[Tuple[Path, float]]:
         """
         Найти похожие изображения для данного
         
         Args:
             image_path: путь к изображению
             other_images: список других изображений для сравнения
+            index: индекс для кеширования pHash между запусками (опционально)
             
         Returns:
             список кортежей (путь к изображению, коэффициент схожести)
         """
-        image = self.load_image(image_path)
-        if image is None:
-            return []
+        other_images = [
+            other_path for other_path in other_images
+            if other_path != image_path and self.config.is_supported_image(other_path)
+        ]
         
-        image_hash = self.calculate_image_hash(image)
-        if image_hash is None:
+        # Исходное изображение хешируется вместе с остальными, первым в пакете
+        paths, hashes = self._phash_all([image_path] + other_images, index)
+        if not paths or paths[0] != image_path:
             return []
         
         results = []
-        
-        for other_path in other_images:
-            if other_path == image_path:
-                continue
-            
-            if not self.config.is_supported_image(other_path):
-                continue
-            
-            other_image = self.load_image(other_path)
-            if other_image is None:
-                continue
-            
-            other_hash = self.calculate_image_hash(other_image)
-            if other_hash is None:
-                continue
-            
-            similarity = self.calculate_similarity(image_hash, other_hash)
+        distances = _popcount(hashes[1:] ^ hashes[0])
+        for offset in np.nonzero(distances <= self.max_distance())[0]:
+            similarity = self.similarity_from_distance(int(distances[offset]))
             
             if similarity >= self.threshold:
-                results.append((other_path, similarity))
+                results.append((paths[1 + int(offset)], similarity))
         
         return results
     
-    def find_all_duplicates(self, image_files: List[Path]) -> List[Tuple[Path, Path, float]]:
+    def find_all_duplicates(self, image_files: List[Path],
+                            index: Optional[FileIndex] = None) -> List[Tuple[Path, Path, float]]:
         """
         Найти все пары дублирующихся изображений
         
         Args:
             image_files: список путей к изображениям
+            index: индекс для кеширования pHash между запусками (опционально)
             
         Returns:
             список кортежей (путь1, путь2, коэффициент схожести)
         """
+        image_files = [
+            image_path for image_path in image_files
+            if self.config.is_supported_image(image_path)
+        ]
         results = []
-        processed = set()
         
-        for i, image1_path in enumerate(image_files):
-            if not self.config.is_supported_image(image1_path):
-                continue
-            
-            image1 = self.load_image(image1_path)
-            if image1 is None:
-                continue
-            
-            hash1 = self.calculate_image_hash(image1)
-            if hash1 is None:
-                continue
-            
-            for image2_path in image_files[i+1:]:
-                if not self.config.is_supported_image(image2_path):
-                    continue
-                
-                # Пропускаем уже обработанные пары
-                pair_key = tuple(sorted([str(image1_path), str(image2_path)]))
-                if pair_key in processed:
-                    continue
-                processed.add(pair_key)
-                
-                image2 = self.load_image(image2_path)
-                if image2 is None:
-                    continue
-                
-                hash2 = self.calculate_image_hash(image2)
-                if hash2 is None:
-                    continue
-                
-                similarity = self.calculate_similarity(hash1, hash2)
+        # Каждое изображение декодируется и хешируется ровно один раз
+        paths, hashes = self._phash_all(image_files, index)
+        radius = self.max_distance()
+        
+        # Расстояния от i-го хеша до всех последующих считаются одной векторной операцией
+        for i in range(len(hashes) - 1):
+            distances = _popcount(hashes[i + 1:] ^ hashes[i])
+            for offset in np.nonzero(distances <= radius)[0]:
+                similarity = self.similarity_from_distance(int(distances[offset]))
                 
                 if similarity >= self.threshold:
-                    results.append((image1_path, image2_path, similarity))
+                    results.append((paths[i], paths[i + 1 + int(offset)], similarity))
         
         return results
 
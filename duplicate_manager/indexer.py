@@ -3,14 +3,47 @@
 """
 
 import json
+import os
 import pickle
+import sqlite3
+from itertools import groupby
+from operator import itemgetter
 from pathlib import Path
-from typing import Dict, List, Optional, Set
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 from datetime import datetime
-from duplicate_manager.config import Config
+from duplicate_manager.config import Config, write_json_atomic
 from duplicate_manager.hasher import FileHasher
 
 
+# Ключи индекса — hex-хеши текущего алгоритма; остальные ключи содержат разделитель:
+# "size-only:..." для нехешированных файлов и "md5:..." для хешей прежнего алгоритма
+HASH_TAG_SEPARATOR = ":"
+
+# Префикс ключа для файлов, которые не хешировались: их размер уникален,
+# поэтому дубликатов у них быть не может
+SIZE_ONLY_PREFIX = "size-only:"
+
+# Версия схемы индекса (PRAGMA user_version)
+INDEX_VERSION = 4
+
+# Версия JSON-формата: в нем хранился индекс раньше, в нем же он выгружается
+JSON_INDEX_VERSION = 2
+
+# Таблицы индекса: строка на файл и кеш pHash изображений
+INDEX_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS files ("
+    "path TEXT PRIMARY KEY, hash TEXT NOT NULL, size INTEGER NOT NULL, "
+    "mtime REAL NOT NULL, inode INTEGER)",
+    "CREATE TABLE IF NOT EXISTS image_hashes (key TEXT PRIMARY KEY, phash TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+)
+
+SQLITE_HEADER = b"SQLite format 3\x00"
+
+# Алгоритмы индекса старого формата по длине hex-хеша (по умолчанию был md5)
+LEGACY_ALGORITHMS = {32: "md5", 64: "sha256"}
+
+
 class FileIndex:
     """Класс для индексации файлов"""
     
@@ -23,81 +56,480 @@ class FileIndex:
         """
         self.config = config
         self.index_path = Path(config.get("index_path", ".duplicate_index"))
-        self.index: Dict[str, Dict] = {}  # hash -> {files: [paths], size: int, modified: datetime}
+        # hash -> {files: {path: None}, size: int, modified: float (st_mtime)};
+        # пути хранятся в словаре как в упорядоченном множестве: удаление за O(1),
+        # а порядок добавления (первый файл группы оставляется) сохраняется
+        self.index: Dict[str, Dict] = {}
+        self.image_hashes: Dict[str, str] = {}  # "dev:ino:mtime_ns:size" -> pHash в hex
+        self.path_to_hash: Dict[str, str] = {}  # обратный индекс: путь -> hash
         self.hasher = FileHasher(config)
+        self._db: Optional[sqlite3.Connection] = None
+        # Изменения с последнего сохранения: пары (SQL, параметры) в порядке применения
+        self._pending: List[Tuple[str, tuple]] = []
         self.load()
     
     def load(self) -> None:
-        """Загрузить индекс из файла"""
-        if not self.index_path.exists():
+        """Загрузить индекс из базы SQLite (индекс старого формата переносится в нее)"""
+        if self._load_legacy():
+            # Без базы индекс старого формата остается доступен только для чтения
+            if self._migrate_legacy():
+                self._check_algorithm()
+            return
+        
+        self._db = self._connect(self.index_path)
+        if self._db is None:
+            return
+        
+        rows = self._db.execute("SELECT path, hash, size, mtime FROM files ORDER BY rowid")
+        for file_str, file_hash, file_size, mtime in rows:
+            if file_hash not in self.index:
+                self.index[file_hash] = {
+                    'files': {},
+                    'size': file_size,
+                    'modified': mtime
+                }
+            self.index[file_hash]['files'][file_str] = None
+            self.path_to_hash[file_str] = file_hash
+        
+        self.image_hashes = dict(self._db.execute("SELECT key, phash FROM image_hashes"))
+        
+        self._check_algorithm()
+    
+    @staticmethod
+    def _connect(db_path: Path) -> Optional[sqlite3.Connection]:
+        """
+        Открыть базу индекса и создать в ней недостающие таблицы
+        
+        Args:
+            db_path: путь к файлу базы
+            
+        Returns:
+            соединение или None в случае ошибки
+        """
+        try:
+            db = sqlite3.connect(str(db_path), isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            for statement in INDEX_SCHEMA:
+                db.execute(statement)
+            db.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+            return db
+        except sqlite3.Error as e:
+            print(f"Ошибка открытия индекса: {e}")
+            return None
+    
+    @staticmethod
+    def _remove_database(db_path: Path) -> None:
+        """Удалить файл базы вместе с файлами WAL, если они есть"""
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.unlink(f"{db_path}{suffix}")
+            except OSError:
+                pass
+    
+    def _check_algorithm(self) -> None:
+        """Сверить алгоритм хеширования индекса с текущим и запомнить текущий"""
+        algorithm = self.hasher.algorithm
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'hash_algorithm'").fetchone()
+        if row is not None and row[0] == algorithm:
             return
         
+        # Индекс без записи об алгоритме считается посчитанным текущим
+        if row is not None:
+            self._retag_hashes(row[0], algorithm)
+        self._pending.append((
+            "INSERT OR REPLACE INTO meta VALUES ('hash_algorithm', ?)", (algorithm,)
+        ))
+        self.save()
+    
+    def _retag_hashes(self, old_algorithm: str, algorithm: str) -> None:
+        """
+        Пометить хеши, посчитанные прежним алгоритмом
+        
+        Ключ "hash" превращается в "old_algorithm:hash". Группы дубликатов
+        остаются видны, а при сканировании такие файлы хешируются заново,
+        только если встретится файл того же размера. Хеши, помеченные
+        текущим алгоритмом (при возврате к нему), снова становятся обычными.
+        
+        Args:
+            old_algorithm: алгоритм, которым посчитаны непомеченные хеши
+            algorithm: текущий алгоритм
+        """
+        old_prefix = f"{old_algorithm}{HASH_TAG_SEPARATOR}"
+        current_prefix = f"{algorithm}{HASH_TAG_SEPARATOR}"
+        
+        index = {}
+        for file_hash, info in self.index.items():
+            if file_hash.startswith(current_prefix):
+                file_hash = file_hash[len(current_prefix):]
+            elif HASH_TAG_SEPARATOR not in file_hash:
+                file_hash = old_prefix + file_hash
+            index[file_hash] = info
+        
+        self.index = index
+        self.path_to_hash = {
+            file_str: file_hash
+            for file_hash, info in self.index.items()
+            for file_str in info['files']
+        }
+        self._pending.append((
+            "UPDATE files SET hash = ? || hash WHERE instr(hash, ?) = 0",
+            (old_prefix, HASH_TAG_SEPARATOR)
+        ))
+        self._pending.append((
+            "UPDATE files SET hash = substr(hash, ?) WHERE substr(hash, 1, ?) = ?",
+            (len(current_prefix) + 1, len(current_prefix), current_prefix)
+        ))
+    
+    def _load_legacy(self) -> bool:
+        """
+        Прочитать индекс старого формата (JSON или pickle)
+        
+        Returns:
+            True, если был найден индекс старого формата
+        """
+        if not self.index_path.is_file() or self.index_path.stat().st_size == 0:
+            return False
+        
+        with open(self.index_path, 'rb') as f:
+            if f.read(len(SQLITE_HEADER)) == SQLITE_HEADER:
+                return False
+        
+        # Алгоритм записан только в выгрузках export_json
+        algorithm = None
         try:
             # Пробуем загрузить как JSON
             with open(self.index_path, 'r', encoding='utf-8') as f:
                 data = json.load(f)
-                # Преобразуем строки дат обратно в datetime
-                for hash_val, info in data.items():
-                    if 'modified' in info:
-                        info['modified'] = datetime.fromisoformat(info['modified'])
+                # Старый формат хранил только словарь hash -> info
+                if 'version' in data:
+                    self.image_hashes = data.get('image_hashes', {})
+                    algorithm = data.get('hash_algorithm')
+                    data = data['files']
                 self.index = data
-        except (json.JSONDecodeError, IOError):
+        except (json.JSONDecodeError, UnicodeDecodeError, IOError):
             # Если не получилось, пробуем pickle
             try:
                 with open(self.index_path, 'rb') as f:
                     self.index = pickle.load(f)
             except (pickle.UnpicklingError, IOError):
                 self.index = {}
+        
+        self._tag_legacy_hashes(algorithm)
+        
+        # Время изменения хранилось как datetime (в JSON — строкой ISO)
+        for info in self.index.values():
+            modified = info.get('modified')
+            if isinstance(modified, str):
+                modified = datetime.fromisoformat(modified)
+            if isinstance(modified, datetime):
+                info['modified'] = modified.timestamp()
+        
+        self.path_to_hash = {
+            file_str: file_hash
+            for file_hash, info in self.index.items()
+            for file_str in info['files']
+        }
+        # Старые версии могли оставить измененный файл и в прежней группе:
+        # как и в базе, путь остается только в последней
+        for file_hash, info in list(self.index.items()):
+            info['files'] = {
+                file_str: None for file_str in info['files']
+                if self.path_to_hash[file_str] == file_hash
+            }
+            if not info['files']:
+                del self.index[file_hash]
+        
+        return True
+    
+    def _tag_legacy_hashes(self, algorithm: Optional[str]) -> None:
+        """
+        Пометить хеши индекса старого формата алгоритмом, которым они посчитаны
+        
+        В старом индексе алгоритм не записан; там могли быть только md5 и sha256,
+        и они различаются длиной. Хеши текущего алгоритма остаются непомеченными,
+        остальные хешируются заново при сравнении (см. needs_rehash).
+        
+        Args:
+            algorithm: алгоритм из выгрузки export_json или None, если он неизвестен
+        """
+        index = {}
+        for file_hash, info in self.index.items():
+            if HASH_TAG_SEPARATOR not in file_hash:
+                file_algorithm = algorithm or LEGACY_ALGORITHMS.get(len(file_hash), "md5")
+                if file_algorithm != self.hasher.algorithm:
+                    file_hash = f"{file_algorithm}{HASH_TAG_SEPARATOR}{file_hash}"
+            index[file_hash] = info
+        self.index = index
+    
+    def _migrate_legacy(self) -> bool:
+        """
+        Перенести в базу индекс, прочитанный из файла старого формата
+        
+        База собирается во временном файле рядом и занимает место старого
+        индекса только после успешной записи; старый файл сохраняется как .bak.
+        При любой ошибке старый файл остается на месте, а прочитанный индекс
+        доступен в памяти.
+        
+        Returns:
+            True, если база создана и открыта
+        """
+        temp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+        backup_path = self.index_path.with_name(self.index_path.name + ".bak")
+        # Остатки прерванного переноса
+        self._remove_database(temp_path)
+        
+        self._db = self._connect(temp_path)
+        if self._db is None:
+            return False
+        
+        for file_hash, info in self.index.items():
+            for file_str in info['files']:
+                self._pending.append((
+                    "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                    (file_str, file_hash, info['size'], info['modified'], None)
+                ))
+        
+        for key, value in self.image_hashes.items():
+            self._pending.append((
+                "INSERT OR REPLACE INTO image_hashes VALUES (?, ?)", (key, value)
+            ))
+        
+        self.save()
+        # Закрытие соединения переносит WAL в основной файл базы
+        self._db.close()
+        self._db = None
+        if self._pending:
+            self._pending = []
+            self._remove_database(temp_path)
+            return False
+        
+        try:
+            os.replace(self.index_path, backup_path)
+        except OSError as e:
+            print(f"Ошибка переноса индекса в SQLite: {e}")
+            self._remove_database(temp_path)
+            return False
+        
+        try:
+            os.replace(temp_path, self.index_path)
+        except OSError as e:
+            print(f"Ошибка переноса индекса в SQLite: {e}")
+            try:
+                os.replace(backup_path, self.index_path)
+                self._remove_database(temp_path)
+            except OSError:
+                pass
+            return False
+        
+        self._db = self._connect(self.index_path)
+        if self._db is None:
+            return False
+        
+        print(f"Индекс перенесен в SQLite, старый файл сохранен как {backup_path}")
+        return True
     
     def save(self) -> None:
-        """Сохранить индекс в файл"""
+        """Записать в базу изменения с последнего сохранения одной транзакцией"""
+        if self._db is None or not self._pending:
+            return
+        
         try:
-            # Сохраняем как JSON для читаемости
-            data = {}
-            for hash_val, info in self.index.items():
-                info_copy = info.copy()
-                if 'modified' in info_copy and isinstance(info_copy['modified'], datetime):
-                    info_copy['modified'] = info_copy['modified'].isoformat()
-                data[hash_val] = info_copy
+            self._db.execute("BEGIN")
+            # Подряд идущие однотипные изменения отправляются одним executemany
+            for sql, group in groupby(self._pending, key=itemgetter(0)):
+                self._db.executemany(sql, (params for _, params in group))
+            self._db.execute("COMMIT")
+            self._pending = []
+        except sqlite3.Error as e:
+            if self._db.in_transaction:
+                self._db.execute("ROLLBACK")
+            print(f"Ошибка сохранения индекса: {e}")
+    
+    def export_json(self, output_path: Path) -> bool:
+        """
+        Выгрузить индекс в JSON
+        
+        Формат совпадает с прежним файлом индекса, поэтому выгрузку можно
+        положить на место index_path: она будет перенесена в базу при запуске.
+        
+        Args:
+            output_path: путь к файлу JSON
             
-            with open(self.index_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+        Returns:
+            True если выгрузка прошла успешно
+        """
+        files = {}
+        for file_hash, info in self.index.items():
+            info_copy = info.copy()
+            info_copy['files'] = list(info['files'])
+            info_copy['modified'] = self.modified_datetime(info).isoformat()
+            files[file_hash] = info_copy
+        
+        data = {
+            'version': JSON_INDEX_VERSION,
+            'hash_algorithm': self.hasher.algorithm,
+            'files': files,
+            'image_hashes': self.image_hashes,
+        }
+        try:
+            write_json_atomic(output_path, data)
+            return True
         except IOError as e:
-            print(f"Ошибка сохранения индекса: {e}")
+            print(f"Ошибка выгрузки индекса: {e}")
+            return False
     
-    def add_file(self, file_path: Path) -> Optional[str]:
+    def add_file(self, file_path: Path, file_hash: Optional[str] = None,
+                 stat_result: Optional[os.stat_result] = None) -> Optional[str]:
         """
         Добавить файл в индекс
         
         Args:
             file_path: путь к файлу
+            file_hash: заранее вычисленный хеш (если None, вычисляется здесь)
+            stat_result: заранее полученный результат stat() файла (опционально)
             
         Returns:
             хеш файла или None в случае ошибки
         """
-        if not self.hasher.should_process(file_path):
+        if stat_result is None:
+            try:
+                stat_result = file_path.stat()
+            except (OSError, IOError):
+                return None
+        
+        # Корень сканирования здесь неизвестен, а каталоги по паттернам уже
+        # отфильтрованы при обходе: паттерны проверяются только по имени файла
+        if not self.hasher.should_process(file_path, stat_result, str(file_path.parent)):
             return None
         
-        file_hash = self.hasher.calculate_hash(file_path)
+        if file_hash is None:
+            file_hash = self.hasher.calculate_hash(file_path)
         if file_hash is None:
             return None
         
-        file_size = self.hasher.get_file_size(file_path)
-        modified_time = datetime.fromtimestamp(file_path.stat().st_mtime)
-        
-        if file_hash not in self.index:
-            self.index[file_hash] = {
-                'files': [],
-                'size': file_size,
-                'modified': modified_time
-            }
-        
+        file_size = stat_result.st_size
+        modified_time = stat_result.st_mtime
         file_str = str(file_path.absolute())
-        if file_str not in self.index[file_hash]['files']:
-            self.index[file_hash]['files'].append(file_str)
+        
+        if self.path_to_hash.get(file_str) != file_hash:
+            # Изменившийся файл переходит из старой группы в новую
+            self._unlink_path(file_str)
+            
+            if file_hash not in self.index:
+                self.index[file_hash] = {
+                    'files': {},
+                    'size': file_size,
+                    'modified': modified_time
+                }
+            
+            self.index[file_hash]['files'][file_str] = None
+            self.path_to_hash[file_str] = file_hash
+            
+            # Новая строка получает новый rowid: после загрузки файл окажется
+            # в конце группы, как и в памяти
+            self._pending.append((
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                (file_str, file_hash, file_size, modified_time, stat_result.st_ino)
+            ))
+        else:
+            # Повторное сканирование неизмененного файла ничего не пишет в базу:
+            # UPDATE без подходящих строк не трогает страницы
+            self._pending.append((
+                "UPDATE files SET size = ?, mtime = ?, inode = ? WHERE path = ? "
+                "AND (size IS NOT ? OR mtime IS NOT ? OR inode IS NOT ?)",
+                (file_size, modified_time, stat_result.st_ino, file_str,
+                 file_size, modified_time, stat_result.st_ino)
+            ))
         
         return file_hash
     
+    def add_file_size_only(self, file_path: Path,
+                           stat_result: Optional[os.stat_result] = None) -> Optional[str]:
+        """
+        Добавить файл в индекс без вычисления хеша
+        
+        Args:
+            file_path: путь к файлу
+            stat_result: заранее полученный результат stat() файла (опционально)
+            
+        Returns:
+            ключ записи в индексе или None в случае ошибки
+        """
+        if stat_result is None:
+            try:
+                stat_result = file_path.stat()
+            except (OSError, IOError):
+                return None
+        
+        file_key = f"{SIZE_ONLY_PREFIX}{stat_result.st_size}:{file_path.absolute()}"
+        return self.add_file(file_path, file_key, stat_result)
+    
+    @staticmethod
+    def modified_datetime(info: Dict) -> datetime:
+        """
+        Время изменения записи индекса как datetime
+        
+        Args:
+            info: запись индекса {files, size, modified}
+            
+        Returns:
+            время изменения
+        """
+        return datetime.fromtimestamp(info['modified'])
+    
+    @staticmethod
+    def is_size_only(file_hash: str) -> bool:
+        """Проверить, что ключ индекса относится к файлу без вычисленного хеша"""
+        return file_hash.startswith(SIZE_ONLY_PREFIX)
+    
+    @staticmethod
+    def needs_rehash(file_hash: str) -> bool:
+        """Проверить, что ключ индекса не является хешем текущего алгоритма"""
+        return HASH_TAG_SEPARATOR in file_hash
+    
+    @staticmethod
+    def image_cache_key(stat_result: os.stat_result) -> str:
+        """
+        Ключ кеша pHash: меняется при любом изменении содержимого файла
+        
+        Args:
+            stat_result: результат stat() файла изображения
+            
+        Returns:
+            строка вида "dev:ino:mtime_ns:size"
+        """
+        return (
+            f"{stat_result.st_dev}:{stat_result.st_ino}:"
+            f"{stat_result.st_mtime_ns}:{stat_result.st_size}"
+        )
+    
+    def get_image_hash(self, key: str) -> Optional[int]:
+        """
+        Получить сохраненный pHash изображения
+        
+        Args:
+            key: ключ из image_cache_key
+            
+        Returns:
+            pHash как 64-битное целое или None, если его нет в кеше
+        """
+        value = self.image_hashes.get(key)
+        return int(value, 16) if value is not None else None
+    
+    def set_image_hash(self, key: str, value: int) -> None:
+        """
+        Сохранить pHash изображения
+        
+        Args:
+            key: ключ из image_cache_key
+            value: pHash как 64-битное целое
+        """
+        self.image_hashes[key] = f"{value:016x}"
+        self._pending.append((
+            "INSERT OR REPLACE INTO image_hashes VALUES (?, ?)", (key, self.image_hashes[key])
+        ))
+    
     def get_duplicates(self) -> Dict[str, List[str]]:
         """
         Получить все дубликаты из индекса
@@ -108,7 +540,7 @@ class FileIndex:
         duplicates = {}
         for file_hash, info in self.index.items():
             if len(info['files']) > 1:
-                duplicates[file_hash] = info['files']
+                duplicates[file_hash] = list(info['files'])
         return duplicates
     
     def find_file_hash(self, file_path: Path) -> Optional[str]:
@@ -121,11 +553,48 @@ class FileIndex:
         Returns:
             хеш файла или None
         """
-        file_str = str(file_path.absolute())
-        for file_hash, info in self.index.items():
-            if file_str in info['files']:
-                return file_hash
-        return None
+        return self.path_to_hash.get(str(file_path.absolute()))
+    
+    def _unlink_path(self, file_str: str) -> None:
+        """Убрать путь из его группы; опустевшая группа удаляется"""
+        file_hash = self.path_to_hash.pop(file_str, None)
+        if file_hash is None:
+            return
+        
+        info = self.index[file_hash]
+        del info['files'][file_str]
+        if not info['files']:
+            del self.index[file_hash]
+    
+    def _rename_path(self, old_str: str, new_str: str) -> None:
+        """Заменить путь в его группе; запись, занимавшая новый путь, вытесняется"""
+        file_hash = self.path_to_hash.get(old_str)
+        if file_hash is None or old_str == new_str:
+            return
+        
+        self._unlink_path(new_str)
+        info = self.index[file_hash]
+        del info['files'][old_str]
+        info['files'][new_str] = None
+        del self.path_to_hash[old_str]
+        self.path_to_hash[new_str] = file_hash
+    
+    def _queue_rename(self, old_str: str, new_str: str) -> None:
+        """
+        Поставить в очередь переименование строки в базе
+        
+        Строка копируется под новым путем (получая новый rowid) и удаляется
+        под старым: после загрузки перемещенный файл окажется в конце группы,
+        как и в памяти.
+        """
+        if old_str == new_str:
+            return
+        
+        self._pending.append((
+            "INSERT OR REPLACE INTO files SELECT ?, hash, size, mtime, inode FROM files WHERE path = ?",
+            (new_str, old_str)
+        ))
+        self._pending.append(("DELETE FROM files WHERE path = ?", (old_str,)))
     
     def remove_file(self, file_path: Path) -> None:
         """
@@ -135,20 +604,39 @@ class FileIndex:
             file_path: путь к файлу
         """
         file_str = str(file_path.absolute())
-        hashes_to_remove = []
+        self._unlink_path(file_str)
+        self._pending.append(("DELETE FROM files WHERE path = ?", (file_str,)))
+    
+    def bulk_update(self, deletions: Iterable[Path] = (),
+                    renames: Iterable[Tuple[Path, Path]] = ()) -> None:
+        """
+        Применить пачку удалений и переименований
         
-        for file_hash, info in self.index.items():
-            if file_str in info['files']:
-                info['files'].remove(file_str)
-                if not info['files']:
-                    hashes_to_remove.append(file_hash)
+        Args:
+            deletions: пути удаленных файлов
+            renames: пары (старый путь, новый путь) перемещенных файлов
+        """
+        removed = [str(file_path.absolute()) for file_path in deletions]
+        renamed = [(str(old.absolute()), str(new.absolute())) for old, new in renames]
         
-        for file_hash in hashes_to_remove:
-            del self.index[file_hash]
+        for file_str in removed:
+            self._unlink_path(file_str)
+        for old_str, new_str in renamed:
+            self._rename_path(old_str, new_str)
+        
+        self._pending.extend(
+            ("DELETE FROM files WHERE path = ?", (file_str,)) for file_str in removed
+        )
+        for old_str, new_str in renamed:
+            self._queue_rename(old_str, new_str)
     
     def clear(self) -> None:
         """Очистить индекс"""
         self.index = {}
+        self.image_hashes = {}
+        self.path_to_hash = {}
+        # Несохраненные изменения теряют смысл: таблицы очищаются целиком
+        self._pending = [("DELETE FROM files", ()), ("DELETE FROM image_hashes", ())]
     
     def update_paths(self, old_path: Path, new_path: Path) -> None:
         """
@@ -161,9 +649,5 @@ class FileIndex:
         old_str = str(old_path.absolute())
         new_str = str(new_path.absolute())
         
-        for file_hash, info in self.index.items():
-            if old_str in info['files']:
-                info['files'].remove(old_str)
-                if new_str not in info['files']:
-                    info['files'].append(new_str)
-
+        self._rename_path(old_str, new_str)
+        self._queue_rename(old_str, new_str)
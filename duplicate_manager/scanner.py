@@ -2,12 +2,17 @@
 Модуль для сканирования файловой системы
 """
 
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
 from pathlib import Path
-from typing import List, Set, Optional
+from typing import Dict, List, Set, Optional, Tuple
 from tqdm import tqdm
 from duplicate_manager.config import Config
 from duplicate_manager.indexer import FileIndex
 from duplicate_manager.hasher import FileHasher
+from duplicate_manager.hasher_uring import UringHasher
 from duplicate_manager.text_matcher import TextMatcher
 from duplicate_manager.image_matcher import ImageMatcher
 
@@ -15,6 +20,9 @@ from duplicate_manager.image_matcher import ImageMatcher
 class FileScanner:
     """Класс для сканирования файловой системы"""
     
+    # Через сколько добавленных файлов индекс сохраняется во время сканирования
+    SAVE_INTERVAL = 10_000
+    
     def __init__(self, config: Config):
         """
         Инициализация
@@ -24,7 +32,10 @@ class FileScanner:
         """
         self.config = config
         self.index = FileIndex(config)
-        self.hasher = FileHasher(config)
+        if config.get("io_uring", False):
+            self.hasher = UringHasher(config)
+        else:
+            self.hasher = FileHasher(config)
         self.text_matcher = TextMatcher(config)
         self.image_matcher = ImageMatcher(config)
     
@@ -40,39 +51,196 @@ class FileScanner:
             print(f"Директория не существует: {directory}")
             return
         
-        files = list(self._collect_files(directory))
+        files = self._collect_files(directory)
+        to_hash, size_only, hashed = self._plan_hashing(files)
+        self._unsaved = 0
+        
+        for file_path in size_only:
+            self.index.add_file_size_only(file_path, files.get(file_path))
+            self._save_periodically()
         
+        for file_path, file_hash in hashed.items():
+            self.index.add_file(file_path, file_hash, files.get(file_path))
+            self._save_periodically()
+        
+        # Хеши считаются пачкой в пуле потоков, в индекс пишем из основного потока
+        hashes = self.hasher.iter_hashes(to_hash)
         if show_progress:
-            files_iter = tqdm(files, desc="Сканирование файлов")
-        else:
-            files_iter = files
+            # Быстрые итерации (мелкие файлы, кеш inode) не должны упираться в
+            # перерисовку: не чаще двух раз в секунду и не более ~1000 обновлений
+            hashes = tqdm(
+                hashes, total=len(to_hash), desc="Сканирование файлов",
+                mininterval=0.5, miniters=max(1, len(to_hash) // 1000), smoothing=0
+            )
         
-        for file_path in files_iter:
-            self.index.add_file(file_path)
+        for file_path, file_hash in hashes:
+            if file_hash is not None:
+                self.index.add_file(file_path, file_hash, files.get(file_path))
+                self._save_periodically()
         
         self.index.save()
         print(f"Проиндексировано файлов: {len(files)}")
     
-    def _collect_files(self, directory: Path) -> List[Path]:
+    def _save_periodically(self) -> None:
+        """
+        Сохранять индекс каждые SAVE_INTERVAL добавленных файлов
+        
+        Очередь несохраненных изменений не растет вместе с деревом, а
+        прерванное сканирование не теряет уже посчитанные хеши.
+        """
+        self._unsaved += 1
+        if self._unsaved >= self.SAVE_INTERVAL:
+            self.index.save()
+            self._unsaved = 0
+    
+    def _plan_hashing(self, files: Dict[Path, os.stat_result]) -> Tuple[List[Path], List[Path], Dict[Path, str]]:
+        """
+        Отобрать файлы, которым нужен полный хеш
+        
+        Дубликатами могут быть только файлы одного размера, а среди них только
+        файлы с одинаковыми началом и концом. Остальные заносятся в индекс без
+        хеширования. Файлы из прошлых сканирований с тем же размером, у которых
+        нет хеша или хеш посчитан прежним алгоритмом, сравниваются заново; если
+        им понадобился полный хеш, их старые записи удаляются из индекса.
+        Небольшие файлы отпечаток читает целиком, и их полный хеш готов сразу.
+        
+        Args:
+            files: словарь {путь: результат stat()} найденных файлов
+            
+        Returns:
+            кортеж (файлы для полного хеширования, файлы без хеширования,
+            словарь {путь: хеш} файлов, хешированных при вычислении отпечатка)
+        """
+        scanned = {str(file_path) for file_path in files}
+        
+        # Файлы из индекса вне текущего сканирования тоже могут оказаться дубликатами
+        indexed_by_size: Dict[int, List[Tuple[str, str]]] = defaultdict(list)
+        for file_hash, info in self.index.index.items():
+            for file_path_str in info['files']:
+                if file_path_str not in scanned:
+                    indexed_by_size[info['size']].append((file_hash, file_path_str))
+        
+        by_size: Dict[int, List[Path]] = defaultdict(list)
+        for file_path, stat_result in files.items():
+            by_size[stat_result.st_size].append(file_path)
+        
+        to_hash = []
+        size_only = []
+        to_fingerprint = []
+        reindexed: Set[Path] = set()
+        
+        for size, group in by_size.items():
+            # Записи об удаленных с тех пор файлах не в счет: иначе одна устаревшая
+            # запись заставила бы полностью хешировать всю группу
+            indexed = [
+                (file_hash, file_path_str)
+                for file_hash, file_path_str in indexed_by_size.get(size, [])
+                if Path(file_path_str).exists()
+            ]
+            unhashed = [
+                Path(file_path_str) for file_hash, file_path_str in indexed
+                if self.index.needs_rehash(file_hash)
+            ]
+            candidates = group + unhashed
+            
+            if len(unhashed) < len(indexed) or (size == 0 and len(candidates) > 1):
+                # С уже хешированными файлами можно сравниться только по полному хешу;
+                # пустые файлы равны без всякого чтения, и отпечаток им не нужен
+                to_hash.extend(candidates)
+                reindexed.update(unhashed)
+            elif len(candidates) == 1:
+                size_only.extend(group)
+            else:
+                to_fingerprint.extend(candidates)
+        
+        by_fingerprint: Dict[Tuple[int, str, str], List[Path]] = defaultdict(list)
+        full_hashes: Dict[Path, str] = {}
+        for file_path, result in self.hasher.iter_fingerprints(to_fingerprint):
+            if result is not None:
+                fingerprint, file_hash = result
+                by_fingerprint[fingerprint].append(file_path)
+                if file_hash is not None:
+                    full_hashes[file_path] = file_hash
+        
+        hashed: Dict[Path, str] = {}
+        for group in by_fingerprint.values():
+            if len(group) > 1:
+                for file_path in group:
+                    if file_path in full_hashes:
+                        hashed[file_path] = full_hashes[file_path]
+                    else:
+                        to_hash.append(file_path)
+                reindexed.update(file_path for file_path in group if str(file_path) not in scanned)
+            else:
+                size_only.extend(file_path for file_path in group if str(file_path) in scanned)
+        
+        for file_path in reindexed:
+            self.index.remove_file(file_path)
+        
+        return to_hash, size_only, hashed
+    
+    def _collect_files(self, directory: Path) -> Dict[Path, os.stat_result]:
         """
         Собрать все файлы из директории
         
+        Обход в ширину через os.scandir: каталоги одного уровня читаются
+        параллельно в пуле потоков (чтение метаданных отпускает GIL). Тип
+        записи известен без отдельного stat(), а единственный stat() на файл
+        кешируется в DirEntry и передается дальше. Каталоги, подпадающие
+        под паттерны исключений, не обходятся. Паттерны проверяются по пути
+        относительно корня сканирования.
+        
         Args:
             directory: путь к директории
             
         Returns:
-            список путей к файлам
+            словарь {абсолютный путь к файлу: результат stat()}
+        """
+        files = {}
+        # От абсолютного корня os.scandir сразу отдает абсолютные пути,
+        # и дальше по конвейеру их не нужно достраивать через getcwd()
+        root = str(directory.absolute())
+        level = [root]
+        
+        with ThreadPoolExecutor(max_workers=self.hasher.workers) as executor:
+            while level:
+                next_level = []
+                # map сохраняет порядок каталогов, поэтому порядок файлов не зависит от потоков
+                for dir_files, subdirs in executor.map(self._scan_dir, level, repeat(root)):
+                    files.update(dir_files)
+                    next_level.extend(subdirs)
+                level = next_level
+        
+        return files
+    
+    def _scan_dir(self, directory: str, root: str) -> Tuple[Dict[Path, os.stat_result], List[str]]:
         """
-        files = []
+        Прочитать один каталог
         
+        Args:
+            directory: путь к каталогу
+            root: корень сканирования для проверки паттернов исключений
+            
+        Returns:
+            кортеж (словарь {путь к файлу: результат stat()}, подкаталоги для обхода)
+        """
+        files = {}
+        subdirs = []
         try:
-            for item in directory.rglob('*'):
-                if item.is_file() and self.hasher.should_process(item):
-                    files.append(item)
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not self.config.should_exclude_dir(Path(entry.path), root):
+                                subdirs.append(entry.path)
+                        elif self.hasher.should_process(entry, root=root):
+                            files[Path(entry.path)] = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
         except (PermissionError, OSError) as e:
             print(f"Ошибка доступа к {directory}: {e}")
         
-        return files
+        return files, subdirs
     
     def find_exact_duplicates(self) -> dict:
         """
@@ -117,7 +285,11 @@ class FileScanner:
                 if file_path.exists() and self.config.is_supported_image(file_path):
                     image_files.append(file_path)
         
-        return self.image_matcher.find_all_duplicates(image_files)
+        results = self.image_matcher.find_all_duplicates(image_files, index=self.index)
+        # Записываются только новые pHash
+        self.index.save()
+        
+        return results
     
     def get_statistics(self) -> dict:
         """
@@ -2,15 +2,22 @@
 Модуль для поиска вложенных текстовых файлов (УР2: один файл содержит другой)
 """
 
+import mmap
+import os
 import re
 from pathlib import Path
-from typing import List, Tuple, Optional, Set
+from typing import FrozenSet, List, Tuple, Optional, Set, Union
 from duplicate_manager.config import Config
 
 
 class TextMatcher:
     """Класс для поиска вложенных текстовых файлов"""
     
+    # Кодировки в порядке попыток декодирования
+    ENCODINGS = ('utf-8', 'utf-16', 'latin-1', 'cp1251', 'cp866')
+    # Последовательности пробельных символов, схлопываемые при нормализации
+    _WS_RE = re.compile(r'\s+')
+    
     def __init__(self, config: Config):
         """
         Инициализация
@@ -20,35 +27,57 @@ class TextMatcher:
         """
         self.config = config
         self.threshold = config.get("text_containment_threshold", 0.8)
-        self.chunk_size = config.get("chunk_size", 8192)
+        self.chunk_size = config.get("chunk_size", 1024 * 1024)
+        self.mmap_threshold = config.get("mmap_threshold", 1024 * 1024)
     
     def read_text_file(self, file_path: Path) -> Optional[str]:
         """
         Прочитать текстовый файл с автоматическим определением кодировки
         
+        Файл читается один раз (большие файлы — через mmap, без промежуточной
+        копии в bytes), кодировки перебираются на уже прочитанных данных.
+        
         Args:
             file_path: путь к файлу
             
         Returns:
             содержимое файла или None в случае ошибки
         """
-        encodings = ['utf-8', 'utf-16', 'latin-1', 'cp1251', 'cp866']
+        try:
+            with open(file_path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if size > 0 and size >= self.mmap_threshold:
+                    try:
+                        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    except (OSError, ValueError):
+                        # Файл усечен до нуля после fstat или не отображается в память:
+                        # читаем обычным образом
+                        mm = None
+                    if mm is not None:
+                        with mm:
+                            return self.decode_text(mm)
+                return self.decode_text(f.read())
+        except (IOError, OSError):
+            return None
+    
+    def decode_text(self, data: Union[bytes, mmap.mmap]) -> str:
+        """
+        Декодировать содержимое файла, перебирая кодировки
         
-        for encoding in encodings:
+        Args:
+            data: байты файла
+            
+        Returns:
+            текст
+        """
+        for encoding in self.ENCODINGS:
             try:
-                with open(file_path, 'r', encoding=encoding) as f:
-                    return f.read()
-            except (UnicodeDecodeError, IOError):
+                return str(data, encoding)
+            except UnicodeDecodeError:
                 continue
         
-        # Если не удалось прочитать как текст, попробуем бинарный режим
-        try:
-            with open(file_path, 'rb') as f:
-                content = f.read()
-                # Попытка декодирования как UTF-8 с игнорированием ошибок
-                return content.decode('utf-8', errors='ignore')
-        except IOError:
-            return None
+        # Если ни одна кодировка не подошла, декодируем как UTF-8 с игнорированием ошибок
+        return str(data, 'utf-8', errors='ignore')
     
     def normalize_text(self, text: str) -> str:
         """
@@ -61,7 +90,7 @@ class TextMatcher:
             нормализованный текст
         """
         # Удаление лишних пробелов и переводов строк
-        text = re.sub(r'\s+', ' ', text)
+        text = self._WS_RE.sub(' ', text)
         # Приведение к нижнему регистру
         text = text.lower()
         # Удаление знаков препинания (опционально)
@@ -88,8 +117,9 @@ class TextMatcher:
         if not contained_normalized:
             return 0.0
         
-        # Простой алгоритм: проверка вхождения
-        if contained_normalized in container_normalized:
+        # Простой алгоритм: проверка вхождения (более длинный текст не может входить в короткий)
+        if (len(contained_normalized) <= len(container_normalized)
+                and contained_normalized in container_normalized):
             return 1.0
         
         # Более сложный алгоритм: проверка по словам
@@ -102,6 +132,65 @@ class TextMatcher:
         common_words = contained_words.intersection(container_words)
         return len(common_words) / len(contained_words)
     
+    def prepare_text(self, text: str) -> Tuple[str, FrozenSet[str]]:
+        """
+        Подготовить текст к многократному сравнению
+        
+        Args:
+            text: исходный текст
+            
+        Returns:
+            кортеж (нормализованный текст, множество его слов)
+        """
+        normalized = self.normalize_text(text)
+        return normalized, frozenset(normalized.split())
+    
+    def calculate_prepared_containment(self, container: Tuple[str, FrozenSet[str]],
+                                       contained: Tuple[str, FrozenSet[str]]) -> float:
+        """
+        Вычислить степень содержания по заранее подготовленным текстам
+        
+        Args:
+            container: результат prepare_text для текста-контейнера
+            contained: результат prepare_text для текста, который должен содержаться
+            
+        Returns:
+            коэффициент содержания (0-1)
+        """
+        container_normalized, container_words = container
+        contained_normalized, contained_words = contained
+        
+        if not contained_normalized:
+            return 0.0
+        
+        if (len(contained_normalized) <= len(container_normalized)
+                and contained_normalized in container_normalized):
+            return 1.0
+        
+        if not contained_words:
+            return 0.0
+        
+        return len(contained_words & container_words) / len(contained_words)
+    
+    def may_contain(self, container: Tuple[str, FrozenSet[str]],
+                    contained: Tuple[str, FrozenSet[str]]) -> bool:
+        """
+        Быстрая проверка, может ли степень содержания достичь порога
+        
+        Более длинный текст не может входить в короткий как подстрока, а доля
+        общих слов не превышает |слова контейнера| / |слова содержимого|.
+        
+        Args:
+            container: результат prepare_text для текста-контейнера
+            contained: результат prepare_text для текста, который должен содержаться
+            
+        Returns:
+            False, если calculate_prepared_containment заведомо ниже порога
+        """
+        if len(contained[0]) <= len(container[0]):
+            return True
+        return len(container[1]) >= self.threshold * len(contained[1])
+    
     def find_contained_files(self, file_path: Path, other_files: List[Path]) -> List[Tuple[Path, float]]:
         """
         Найти файлы, которые содержатся в данном файле
@@ -117,6 +206,8 @@ class TextMatcher:
         if not container_text:
             return []
         
+        # Контейнер читается и нормализуется один раз, а не для каждого кандидата
+        container = self.prepare_text(container_text)
         results = []
         
         for other_file in other_files:
@@ -130,7 +221,7 @@ class TextMatcher:
             if not contained_text:
                 continue
             
-            containment = self.calculate_containment(container_text, contained_text)
+            containment = self.calculate_prepared_containment(container, self.prepare_text(contained_text))
             
             if containment >= self.threshold:
                 results.append((other_file, containment))
@@ -149,30 +240,35 @@ class TextMatcher:
         """
         results = []
         
-        for i, file1 in enumerate(text_files):
-            if not self.config.is_supported_text(file1):
+        # Неподдерживаемые и пустые файлы отбрасываются заранее. Каждый файл
+        # читается и нормализуется один раз, множества слов строятся заранее:
+        # на пару остаются поиск подстроки и пересечение множеств
+        files = []
+        prepared = []
+        for file_path in text_files:
+            if not self.config.is_supported_text(file_path):
                 continue
             
-            for file2 in text_files[i+1:]:
-                if not self.config.is_supported_text(file2):
-                    continue
-                
-                # Проверяем оба направления
-                text1 = self.read_text_file(file1)
-                text2 = self.read_text_file(file2)
-                
-                if not text1 or not text2:
-                    continue
+            text = self.read_text_file(file_path)
+            if text:
+                files.append(file_path)
+                prepared.append(self.prepare_text(text))
+        
+        for i, file1 in enumerate(files):
+            for j in range(i + 1, len(files)):
+                file2 = files[j]
                 
-                # file1 содержит file2?
-                containment1 = self.calculate_containment(text1, text2)
-                if containment1 >= self.threshold:
-                    results.append((file1, file2, containment1))
+                # file1 содержит file2? Направление, в котором порог недостижим
+                # по длине текста и числу слов, не сравнивается
+                if self.may_contain(prepared[i], prepared[j]):
+                    containment1 = self.calculate_prepared_containment(prepared[i], prepared[j])
+                    if containment1 >= self.threshold:
+                        results.append((file1, file2, containment1))
                 
                 # file2 содержит file1?
-                containment2 = self.calculate_containment(text2, text1)
-                if containment2 >= self.threshold:
-                    results.append((file2, file1, containment2))
+                if self.may_contain(prepared[j], prepared[i]):
+                    containment2 = self.calculate_prepared_containment(prepared[j], prepared[i])
+                    if containment2 >= self.threshold:
+                        results.append((file2, file1, containment2))
         
         return results
-
@@ -21,10 +21,17 @@ setup(
     packages=find_packages(),
     install_requires=[
         "Pillow>=10.0.0",
+        "blake3>=0.4",
         "imagehash>=4.3.1",
+        "numpy>=1.21.0",
+        "scipy>=1.7.0",
         "tqdm>=4.66.0",
         "click>=8.1.0",
     ],
+    extras_require={
+        "fast": ["xxhash>=3.0"],
+        "uring": ["liburing"],
+    },
     python_requires=">=3.7",
     entry_points={
         "console_scripts": [